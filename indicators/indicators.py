@@ -1,30 +1,75 @@
 import os
+import bottleneck as bn
+import numpy as np
+import orjson
 import pandas as pd
 import requests
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def get_crypto_symbols_from_env():
-    cryptos = os.getenv("CRYPTOS", "BTC").split(",")
-    return [c.strip().upper() for c in cryptos]
+MAX_WORKERS = 10
+REQUEST_TIMEOUT = 10
+HOUR_SECONDS = 3600
+
+RSI_BULLISH = 60.0
+RSI_BEARISH = 40.0
+ADX_STRONG = 25.0
+
+# Signals classified by comparing a value against a reference, with the label used
+# when the value is not above it and the label used when the reference is missing
+_SIGNALS = ("BB", "SMA20", "EMA50", "VWAP", "ADX", "MACD", "Stochastic", "ATR", "OBV")
+_BELOW_LABELS = np.array(["🟡", "🔴", "🔴", "🔴", "🔴", "🔴", "🔴", "🔴", "🔴"])
+_MISSING_REF_LABELS = np.array(["🟡", "🟡", "🟡", "🟡", "🔴", "🔴", "🔴", "🟡", "🟡"])
+
+# Hourly OHLCV history per (symbol, currency), extended with new candles on each fetch
+_OHLCV_STATE = {}
+
+# Latest indicators per symbol, keyed by the open time of the newest hourly candle
+_INDICATOR_CACHE = {}
+
+# Shared session so connections to the data APIs are kept alive across symbols
+_SESSION = requests.Session()
+_SESSION.headers.update({'Accept-Encoding': 'gzip, deflate'})
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=MAX_WORKERS,
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+def parse_symbols(raw: str) -> tuple[str, ...]:
+    """Parse a comma-separated symbol list, normalising case and dropping blanks and duplicates"""
+    symbols = (c.strip().upper() for c in raw.split(","))
+    return tuple(dict.fromkeys(s for s in symbols if s))
+
+@cache
+def get_crypto_symbols_from_env() -> tuple[str, ...]:
+    # Parsed once on first use (after .env has been loaded) and reused afterwards
+    return parse_symbols(os.getenv("CRYPTOS", "BTC"))
 
 def fetch_full_ohlcv(symbol='BTC', currency='USD', total_hours=8400):
     """
     Fetch historical hourly OHLCV data with pagination to get enough data for weekly indicators
     """
     logging.info(f"Fetching {total_hours} hourly candles for {symbol}/{currency}...")
-    all_data = []
-    limit = 2000  # Maximum limit allowed by CryptoCompare
+    # Preallocated buffers filled from the end, since pages arrive newest first
+    times = np.empty(total_hours, dtype=np.int64)
+    ohlcv = np.empty((total_hours, 5), dtype=np.float64)
+    cursor = total_hours
+    limit = min(2000, total_hours)  # Maximum limit allowed by CryptoCompare is 2000
     toTs = None
 
-    while len(all_data) < total_hours:
+    while cursor > 0:
         try:
             url = f"https://min-api.cryptocompare.com/data/v2/histohour?fsym={symbol}&tsym={currency}&limit={limit}"
             if toTs:
                 url += f"&toTs={toTs}"
             
-            response = requests.get(url)
-            data = response.json()
+            response = _SESSION.get(url, timeout=REQUEST_TIMEOUT)
+            data = orjson.loads(response.content)
             
             if data.get("Response") != "Success" or not data.get("Data", {}).get("Data"):
                 logging.error(f"Error fetching data: {data.get('Message', 'Unknown error')}")
@@ -34,60 +79,112 @@ def fetch_full_ohlcv(symbol='BTC', currency='USD', total_hours=8400):
             if not batch_data:
                 break
                 
-            all_data = batch_data + all_data
+            # Keep only the newest candles of the batch that still fit
+            batch = batch_data[-cursor:]
+            start = cursor - len(batch)
+            times[start:cursor] = [r['time'] for r in batch]
+            ohlcv[start:cursor] = [(r['open'], r['high'], r['low'], r['close'], r['volumefrom']) for r in batch]
+            cursor = start
             toTs = batch_data[0]['time'] - 1  # Go back in time
             
-            logging.info(f"Fetched {len(batch_data)} candles, total: {len(all_data)}/{total_hours}")
+            logging.info(f"Fetched {len(batch_data)} candles, total: {total_hours - cursor}/{total_hours}")
             
             # Be nice to the API
-            time.sleep(0.5)
+            if cursor > 0:
+                time.sleep(0.5)
             
         except Exception as e:
             logging.error(f"Error during pagination: {e}")
             break
 
-    # Create DataFrame from collected data
-    df = pd.DataFrame(all_data[:total_hours])
-    
-    # Convert timestamp to datetime
-    df['timestamp'] = pd.to_datetime(df['time'], unit='s')
-    df.set_index('timestamp', inplace=True)
-    
-    # Rename columns to match our expected format
-    df = df.rename(columns={
-        'open': 'open',
-        'high': 'high',
-        'low': 'low',
-        'close': 'close',
-        'volumefrom': 'volume'
-    })
-    
-    # Select only the columns we need
-    return df[['open', 'high', 'low', 'close', 'volume']]
+    index = pd.DatetimeIndex(pd.to_datetime(times[cursor:], unit='s'), name='timestamp')
+    return pd.DataFrame(ohlcv[cursor:], columns=['open', 'high', 'low', 'close', 'volume'], index=index)
+
+def fetch_recent_ohlcv(symbol='BTC', currency='USD', total_hours=8400):
+    """
+    Fetch hourly OHLCV data, reusing the history from the previous call and only requesting newer candles
+    """
+    key = (symbol, currency)
+    previous = _OHLCV_STATE.get(key)
+    if previous is None or len(previous) < total_hours:
+        df = fetch_full_ohlcv(symbol, currency, total_hours)
+    else:
+        # The last stored candle may still have been open, so fetch it again
+        last_ts = int(previous.index[-1].timestamp())
+        new_hours = (int(time.time()) - last_ts) // HOUR_SECONDS + 1
+        if new_hours >= total_hours:
+            df = fetch_full_ohlcv(symbol, currency, total_hours)
+        else:
+            delta = fetch_full_ohlcv(symbol, currency, new_hours)
+            if delta.empty:
+                return previous
+            df = pd.concat([previous[previous.index < delta.index[0]], delta]).iloc[-total_hours:]
+
+    if not df.empty:
+        _OHLCV_STATE[key] = df
+    return df
+
+def fetch_many(symbols, currency='USD', total_hours=8400):
+    """
+    Fetch hourly OHLCV data for several symbols concurrently
+    """
+    if not symbols:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(symbols))) as ex:
+        futures = {ex.submit(fetch_recent_ohlcv, s, currency, total_hours): s for s in symbols}
+        return {futures[f]: f.result() for f in as_completed(futures)}
+
+def rolling_window(values, window, func, **kwargs):
+    """Apply a bottleneck moving-window function, all NaN when there are fewer values than the window"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.full(len(values), np.nan)
+    return func(values, window, **kwargs)
 
 def calculate_rsi(prices, period=14):
-    """Calculate RSI manually to avoid pandas_ta issues"""
+    """Calculate RSI manually (Wilder's smoothing) to avoid pandas_ta issues"""
     delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    gain = delta.where(delta > 0, 0).ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
+    loss = (-delta.where(delta < 0, 0)).ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
     rs = gain / loss
     return 100 - (100 / (1 + rs))
 
 def calculate_sma(prices, period=20):
     """Calculate Simple Moving Average"""
-    return prices.rolling(window=period).mean()
+    return rolling_window(prices, period, bn.move_mean)
+
+def calculate_atr(high, low, close, period=14):
+    """Calculate Average True Range as a rolling mean of the fused True Range"""
+    prev_close = np.r_[close[:1], close[:-1]]
+    tr = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    return rolling_window(tr, period, bn.move_mean)
 
-def calculate_ema(prices, period=50):
-    """Calculate Exponential Moving Average"""
-    return prices.ewm(span=period).mean()
+def calculate_obv(close, volume):
+    """Calculate On-Balance Volume as a cumulative signed volume"""
+    return (np.sign(np.diff(close, prepend=close[:1])) * volume).cumsum()
+
+def multi_ema(values, spans):
+    """Calculate recursive (adjust=False) Exponential Moving Averages for several spans, keyed by span"""
+    prices = pd.Series(np.asarray(values, dtype=np.float64))
+    return {span: prices.ewm(span=span, adjust=False).mean().to_numpy() for span in spans}
 
 def get_indicators(symbol):
     try:
+        # Skip the fetch entirely while we are still inside the cached hourly candle
+        cached = _INDICATOR_CACHE.get(symbol)
+        current_bucket = int(time.time()) // HOUR_SECONDS * HOUR_SECONDS
+        if cached is not None and cached[0] == current_bucket:
+            return cached[1]
+
         # Use the paginated fetch to get enough data for weekly indicators
-        df = fetch_full_ohlcv(symbol=symbol, currency='USD', total_hours=8400)
+        df = fetch_recent_ohlcv(symbol=symbol, currency='USD', total_hours=8400)
         if df is None or df.empty:
             logging.warning(f"Failed to fetch {symbol} OHLCV data. Indicators cannot be calculated.")
             return None
+
+        last_open = int(df.index[-1].timestamp())
+        if cached is not None and cached[0] == last_open:
+            return cached[1]
         
         # Resample to weekly OHLCV (weekly candles starting from Monday)
         weekly_df = df.resample('W-MON').agg({
@@ -100,91 +197,98 @@ def get_indicators(symbol):
         
         logging.info(f"Created {len(weekly_df)} weekly candles from {len(df)} hourly candles for {symbol}")
         
-        # Calculate indicators manually on weekly data
-        weekly_df['RSI_14'] = calculate_rsi(weekly_df['close'], 14)
-        weekly_df['SMA_20'] = calculate_sma(weekly_df['close'], 20)
-        weekly_df['EMA_50'] = calculate_ema(weekly_df['close'], 50)
+        # Calculate indicators manually on weekly data, collecting the columns
+        # so they are added to the frame in a single concat
+        close_s = weekly_df['close']
+        high = weekly_df['high'].to_numpy()
+        low = weekly_df['low'].to_numpy()
+        close = close_s.to_numpy()
+        volume = weekly_df['volume'].to_numpy()
+        columns = {}
+
+        columns['RSI_14'] = calculate_rsi(close_s, 14).to_numpy()
+        sma_20 = calculate_sma(close, 20)
+        columns['SMA_20'] = sma_20
+        emas = multi_ema(close, [12, 26, 50])
+        columns['EMA_50'] = emas[50]
         
         # Simple VWAP calculation
-        weekly_df['VWAP'] = (weekly_df['close'] * weekly_df['volume']).cumsum() / weekly_df['volume'].cumsum()
+        columns['VWAP'] = (close * volume).cumsum() / volume.cumsum()
         
         # Simple Bollinger Bands
-        sma_20 = weekly_df['SMA_20']
-        std_20 = weekly_df['close'].rolling(window=20).std()
-        weekly_df['BBU_20_2.0'] = sma_20 + (std_20 * 2)
-        weekly_df['BBL_20_2.0'] = sma_20 - (std_20 * 2)
+        std_20 = rolling_window(close, 20, bn.move_std, ddof=0)
+        columns['BBU_20_2.0'] = sma_20 + (std_20 * 2)
+        columns['BBL_20_2.0'] = sma_20 - (std_20 * 2)
         
         # MACD calculation
-        ema_12 = calculate_ema(weekly_df['close'], 12)
-        ema_26 = calculate_ema(weekly_df['close'], 26)
-        weekly_df['MACD_12_26_9'] = ema_12 - ema_26
-        weekly_df['MACDs_12_26_9'] = calculate_ema(weekly_df['MACD_12_26_9'], 9)
+        macd = emas[12] - emas[26]
+        columns['MACD_12_26_9'] = macd
+        columns['MACDs_12_26_9'] = multi_ema(macd, [9])[9]
         
         # Simple Stochastic
-        low_14 = weekly_df['low'].rolling(window=14).min()
-        high_14 = weekly_df['high'].rolling(window=14).max()
-        weekly_df['STOCHk_14_3_3'] = 100 * ((weekly_df['close'] - low_14) / (high_14 - low_14))
-        weekly_df['STOCHd_14_3_3'] = weekly_df['STOCHk_14_3_3'].rolling(window=3).mean()
-        
-        # Simple ATR
-        tr1 = weekly_df['high'] - weekly_df['low']
-        tr2 = abs(weekly_df['high'] - weekly_df['close'].shift(1))
-        tr3 = abs(weekly_df['low'] - weekly_df['close'].shift(1))
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        weekly_df['ATRr_14'] = tr.rolling(window=14).mean()
+        low_14 = rolling_window(low, 14, bn.move_min)
+        high_14 = rolling_window(high, 14, bn.move_max)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch_k = 100 * ((close - low_14) / (high_14 - low_14))
+        columns['STOCHk_14_3_3'] = stoch_k
+        columns['STOCHd_14_3_3'] = rolling_window(stoch_k, 3, bn.move_mean)
         
-        # Simple OBV
-        obv = [0]
-        for i in range(1, len(weekly_df)):
-            if weekly_df['close'].iloc[i] > weekly_df['close'].iloc[i-1]:
-                obv.append(obv[-1] + weekly_df['volume'].iloc[i])
-            elif weekly_df['close'].iloc[i] < weekly_df['close'].iloc[i-1]:
-                obv.append(obv[-1] - weekly_df['volume'].iloc[i])
-            else:
-                obv.append(obv[-1])
-        weekly_df['OBV'] = obv
+        # Simple ATR and OBV (raw arrays, no temporary Series)
+        columns['ATRr_14'] = calculate_atr(high, low, close, 14)
+        columns['OBV'] = calculate_obv(close, volume)
         
         # Simple ADX approximation (trend strength)
-        weekly_df['ADX_14'] = weekly_df['close'].rolling(window=14).std() / weekly_df['close'].rolling(window=14).mean() * 100
+        columns['ADX_14'] = rolling_window(close, 14, bn.move_std, ddof=1) / rolling_window(close, 14, bn.move_mean) * 100
+
+        weekly_df = pd.concat([weekly_df, pd.DataFrame(columns, index=weekly_df.index)], axis=1)
 
         # Get the latest weekly data point
         latest = weekly_df.iloc[-1]
 
-        def classify(value, indicator):
-            if pd.isna(value):
-                return "🟡"
-            if indicator == "RSI":
-                return "🟢" if value > 60 else "🔴" if value < 40 else "🟡"
-            elif indicator == "MACD":
-                return "🟢" if latest['MACD_12_26_9'] > latest['MACDs_12_26_9'] else "🔴"
-            elif indicator == "Stoch":
-                return "🟢" if latest['STOCHk_14_3_3'] > latest['STOCHd_14_3_3'] else "🔴"
-            elif indicator == "ADX":
-                return "Strong" if value > 25 else "Weak"
-            elif indicator == "ATR":
-                # Higher ATR indicates higher volatility
-                prev_atr = weekly_df['ATRr_14'].iloc[-2] if len(weekly_df) > 1 else value
-                return "🟢" if value > prev_atr else "🔴" if value <= prev_atr else "🟡"
-            elif indicator == "OBV":
-                # Rising OBV is bullish, falling is bearish
-                prev_obv = weekly_df['OBV'].iloc[-2] if len(weekly_df) > 1 else value
-                return "🟢" if value > prev_obv else "🔴" if value <= prev_obv else "🟡"
-            else:
-                return "🟡"
+        # Previous week for the ATR/OBV trend; with a single week compare against itself
+        previous = weekly_df.iloc[-2] if len(weekly_df) > 1 else latest
+
+        # All reference-based signals in one comparison: price vs BB/SMA/EMA/VWAP,
+        # ADX vs threshold, MACD vs signal, %K vs %D, ATR/OBV vs previous week
+        close_last = latest['close']
+        vals = np.array([
+            close_last, close_last, close_last, close_last, latest['ADX_14'],
+            latest['MACD_12_26_9'], latest['STOCHk_14_3_3'], latest['ATRr_14'], latest['OBV']
+        ], dtype=np.float64)
+        refs = np.array([
+            latest['BBL_20_2.0'], latest['SMA_20'], latest['EMA_50'], latest['VWAP'], ADX_STRONG,
+            latest['MACDs_12_26_9'], latest['STOCHd_14_3_3'], previous['ATRr_14'], previous['OBV']
+        ], dtype=np.float64)
+        labels = np.where(vals > refs, "🟢", _BELOW_LABELS)
+        labels = np.where(np.isnan(refs), _MISSING_REF_LABELS, labels)
+        labels = np.where(np.isnan(vals), "🟡", labels)
+        label, value, ref = (dict(zip(_SIGNALS, a)) for a in (labels, vals, refs))
+
+        rsi = latest['RSI_14']
+        rsi_label = "🟢" if rsi > RSI_BULLISH else "🔴" if rsi < RSI_BEARISH else "🟡"
 
         indicators = {
-            "RSI": f"{classify(latest['RSI_14'], 'RSI')} ({latest['RSI_14']:.2f})",
-            "MACD": f"{classify(latest['MACD_12_26_9'], 'MACD')} ({latest['MACD_12_26_9']:.2f})",
-            "Stochastic": f"{classify(latest['STOCHk_14_3_3'], 'Stoch')} ({latest['STOCHk_14_3_3']:.2f})",
-            "BB": f"{'🟢' if 'BBL_20_2.0' in latest and not pd.isna(latest['BBL_20_2.0']) and latest['close'] > latest['BBL_20_2.0'] else '🟡'} ({latest['close']:.2f}/{latest['BBL_20_2.0']:.2f})" if 'BBL_20_2.0' in latest and not pd.isna(latest['BBL_20_2.0']) else "🟡 (N/A)",
-            "SMA20": f"{'🟢' if not pd.isna(latest['SMA_20']) and latest['close'] > latest['SMA_20'] else '🔴'} ({latest['close']:.2f}/{latest['SMA_20']:.2f})" if not pd.isna(latest['SMA_20']) else "🟡 (N/A)",
-            "EMA50": f"{'🟢' if not pd.isna(latest['EMA_50']) and latest['close'] > latest['EMA_50'] else '🔴'} ({latest['close']:.2f}/{latest['EMA_50']:.2f})" if not pd.isna(latest['EMA_50']) else "🟡 (N/A)",
-            "VWAP": f"{'🟢' if not pd.isna(latest['VWAP']) and latest['close'] > latest['VWAP'] else '🔴'} ({latest['close']:.2f}/{latest['VWAP']:.2f})" if not pd.isna(latest['VWAP']) else "🟡 (N/A)",
-            "ADX": f"{'🟢' if latest['ADX_14'] > 25 else '🔴'} ({latest['ADX_14']:.2f})",
-            "ATR": f"{classify(latest['ATRr_14'], 'ATR')} ({latest['ATRr_14']:.2f})" if not pd.isna(latest['ATRr_14']) else "🟡 (N/A)",
-            "OBV": f"{classify(latest['OBV'], 'OBV')} (${latest['OBV']:.2f})" if not pd.isna(latest['OBV']) else "🟡 (N/A)"
+            "RSI": f"{rsi_label} ({rsi:.2f})",
+            "MACD": f"{label['MACD']} ({value['MACD']:.2f})",
+            "Stochastic": f"{label['Stochastic']} ({value['Stochastic']:.2f})",
         }
+        for name in ("BB", "SMA20", "EMA50", "VWAP"):
+            indicators[name] = "🟡 (N/A)" if np.isnan(ref[name]) else f"{label[name]} ({close_last:.2f}/{ref[name]:.2f})"
+        indicators["ADX"] = f"{label['ADX']} ({value['ADX']:.2f})"
+        indicators["ATR"] = "🟡 (N/A)" if np.isnan(value['ATR']) else f"{label['ATR']} ({value['ATR']:.2f})"
+        indicators["OBV"] = "🟡 (N/A)" if np.isnan(value['OBV']) else f"{label['OBV']} (${value['OBV']:.2f})"
+        _INDICATOR_CACHE[symbol] = (last_open, indicators)
         return indicators
     except Exception as e:
         logging.error(f"Error calculating indicators for {symbol}: {e}")
         return None
+
+def get_indicators_many(symbols):
+    """
+    Calculate indicators for several symbols concurrently, keyed by symbol
+    """
+    if not symbols:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(symbols))) as ex:
+        futures = {ex.submit(get_indicators, s): s for s in symbols}
+        return {futures[f]: f.result() for f in as_completed(futures)}
@@ -1,14 +1,15 @@
 import logging
-from indicators.indicators import get_crypto_symbols_from_env, get_indicators
+from indicators.indicators import get_crypto_symbols_from_env, get_indicators_many
 from telegram.alert import send_telegram_message
 
 logging.basicConfig(level=logging.INFO)
 
 def run():
     symbols = get_crypto_symbols_from_env()
+    results = get_indicators_many(symbols)
     for symbol in symbols:
         try:
-            indicators = get_indicators(symbol)
+            indicators = results.get(symbol)
             if indicators is None:
                 logging.warning(f"Could not fetch {symbol} indicators. Skipping message.")
                 continue
@@ -31,8 +32,8 @@ def run():
             """
             try:
                 send_telegram_message(message)
-                logging.info(f"Sent Telegram message for {symbol}")
+                logging.info(f"Queued Telegram message for {symbol}")
             except Exception as e:
-                logging.error(f"Failed to send Telegram message for {symbol}: {e}")
+                logging.error(f"Failed to queue Telegram message for {symbol}: {e}")
         except Exception as e:
             logging.error(f"Error processing {symbol}: {e}")
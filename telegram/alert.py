@@ -1,7 +1,24 @@
+import atexit
+import logging
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def send_telegram_message(message):
+REQUEST_TIMEOUT = 5
+
+# Reuse the connection to the Telegram API across alerts
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Alerts are posted in order by a single background worker; pending ones are flushed on exit
+_ALERT_POOL = ThreadPoolExecutor(max_workers=1)
+atexit.register(_ALERT_POOL.shutdown, wait=True)
+
+def _do_post(message):
     try:
         token = os.getenv("TELEGRAM_BOT_TOKEN")
         chat_id = os.getenv("TELEGRAM_CHAT_ID")
@@ -11,6 +28,10 @@ def send_telegram_message(message):
             "text": message,
             "parse_mode": "Markdown"
         }
-        requests.post(url, data=payload)
+        _SESSION.post(url, data=payload, timeout=REQUEST_TIMEOUT)
     except Exception as e:
-        print(f"Error sending Telegram message: {e}")
+        logging.error(f"Error sending Telegram message: {e}")
+
+def send_telegram_message(message):
+    """Queue a Telegram message without waiting for the request to finish"""
+    return _ALERT_POOL.submit(_do_post, message)